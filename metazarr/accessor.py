@@ -13,12 +13,22 @@ import json
 from .config   import OutputFormat
 from .catalog  import show_dataset_info
 from .exceptions import RangeError
+from .executor import compute_kwargs, open_mfdataset
+from .utils    import read_marker
+
+# subset() 支持裁剪的坐标，顺序对应参数 time / lat / lon / level / step
+SEL_COORDS = ["valid_time", "latitude", "longitude", "pressure_level", "step"]
 
 # ────────────────────────────────────────────────────────────────────────
 def _collect_zarr_stores(root: Path) -> List[str]:
     if root.suffix == ".zarr":
         return [str(root)]
-    stores = sorted(str(p) for p in root.glob("*.zarr"))
+    paths = sorted(root.glob("*.zarr"))
+    # compact 中途：已提交的周期 store 取代其 sources，未删除的源 store 不再重复读取
+    superseded = set()
+    for p in paths:
+        superseded.update(set((read_marker(p) or {}).get("sources", [])) - {p.name})
+    stores = [str(p) for p in paths if p.name not in superseded]
     if not stores:
         raise FileNotFoundError(f"{root} 下未发现 *.zarr")
     return stores
@@ -31,17 +41,17 @@ def open_dataset(name: str) -> "MZDataset":
 
     root   = Path(info["path"])
     stores = _collect_zarr_stores(root)
+    # 全部 store 都带合并元数据（如 compact 之后）时走 consolidated 快速路径
+    consolidated = all((Path(s) / ".zmetadata").exists() for s in stores)
 
-    ds = xr.open_mfdataset(
+    ds = open_mfdataset(
         stores,
+        operation="query",
         engine="zarr",
         concat_dim="valid_time",
-        combine="nested",
         coords="minimal",
-        parallel=True,
-        consolidated=True,
         chunks={},
-        backend_kwargs={"consolidated": False},
+        backend_kwargs={"consolidated": consolidated},
     )
 
     return MZDataset(ds, info)
@@ -68,6 +78,15 @@ class MZDataset:
         ds_sub = self.subset(vars=vars, time=time, lat=lat,
                              lon=lon, level=level, step=step)
 
+        # records / split 的行数 = 各维长度之积，读数据前先检查
+        if orient != "ndarray":
+            n_rows = int(np.prod(list(ds_sub.sizes.values()), dtype=np.int64))
+            if n_rows > max_points:
+                raise ValueError(f"返回 {n_rows} 行，超过上限 {max_points}")
+
+        # 在 query 执行池上一次性读入
+        ds_sub = ds_sub.load(**compute_kwargs("query"))
+
         # ----- 1) ndarray --------------------------------------------------
         if orient == "ndarray":
             if vars and len(vars) == 1:
@@ -106,10 +125,7 @@ class MZDataset:
                 return {coord: rng[0]}
             return {coord: slice(rng[0], rng[-1])}
 
-        for coord, rng in zip(
-            ["valid_time", "latitude", "longitude", "pressure_level", "step"],
-            [time, lat, lon, level, step],
-        ):
+        for coord, rng in zip(SEL_COORDS, [time, lat, lon, level, step]):
             sel = _sel(coord, rng)
             if not sel:
                 continue
@@ -124,7 +140,9 @@ class MZDataset:
     def to(self, ds: xr.Dataset, fmt: OutputFormat, out_path: str | Path):
         out_path = Path(out_path)
         if fmt is OutputFormat.ZARR:
-            ds.to_zarr(out_path, mode="w", consolidated=True)
+            ds.to_zarr(out_path, mode="w", consolidated=True,
+                       compute=False).compute(**compute_kwargs("query"))
+        # NetCDF/HDF 单文件写入依赖 xarray 按调度器选择的文件锁，仍走 dask 默认调度
         elif fmt is OutputFormat.NETCDF:
             ds.to_netcdf(out_path, mode="w")
         elif fmt is OutputFormat.HDF:
@@ -0,0 +1,294 @@
+"""
+batching.py
+功能二‑4：突发小查询的批处理 / 合并读取
+
+在 MZDataset 之上加一层请求调度：
+  • 在一个很短的时间窗内收集并发的 subset / to_json 请求
+  • 选区互相重叠（且变量、level/step 兼容）的请求合并成一次"包络"读取，
+    只构建一次 dask 图、每个 chunk 只读一次
+  • 读入内存后再按各自的原始参数裁剪，结果分发回各请求
+  • 无范围限制或包络超过 max_bytes 的组不合并，逐个直接交给 MZDataset（保持惰性）
+"""
+from __future__ import annotations
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .accessor import MZDataset, SEL_COORDS
+from .executor import compute_kwargs
+from .utils import log
+
+# 请求参数名 → 数据坐标名（与 MZDataset.subset 保持一致）
+_RANGE_KEYS = dict(zip(["time", "lat", "lon", "level", "step"], SEL_COORDS))
+
+
+# ──────────────── 统计 ────────────────────────────────────────
+@dataclass
+class BatchStats:
+    requests: int = 0       # 收到的请求数
+    batches:  int = 0       # 触发的时间窗数
+    reads:    int = 0       # 实际执行的合并读取次数
+
+    @property
+    def coalescing_ratio(self) -> float:
+        """请求数 / 实际读取数；越大说明合并越充分"""
+        return self.requests / self.reads if self.reads else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "requests":         self.requests,
+            "batches":          self.batches,
+            "reads":            self.reads,
+            "coalescing_ratio": round(self.coalescing_ratio, 3),
+        }
+
+
+@dataclass
+class _Request:
+    kind:   str                         # "subset" | "to_json"
+    kwargs: Dict[str, Any]
+    future: Future = field(default_factory=Future)
+    box:    Dict[str, tuple | None] = field(default_factory=dict)
+
+
+# ──────────────── 选区包络 ────────────────────────────────────
+def _bounds(rng, coord: str, times: pd.Index | None):
+    """
+    把 (a, b) 选区转成可比较的闭区间 (lo, hi)；None ⇒ 不限。
+    时间按索引解析："2020-11-01" 这类不完整的字符串和 subset 一样展开为整天 / 整点，
+    结果取实际命中的首末时刻；什么都不命中时返回 ()。
+    """
+    if rng is None:
+        return None
+    lo, hi = rng[0], rng[-1]
+    if coord == "valid_time" and times is not None:
+        i, j = times.slice_locs(lo, hi)
+        if i >= j:                                       # 反序的区间同样纳入包络
+            i, j = times.slice_locs(hi, lo)
+        return (times[i], times[j - 1]) if i < j else ()
+    return (lo, hi) if lo <= hi else (hi, lo)
+
+
+def _box_of(kwargs: Dict[str, Any], times: pd.Index | None) -> Dict[str, tuple | None]:
+    """请求的选区包络；参数非法（无法解析/比较）时抛异常"""
+    return {coord: _bounds(kwargs.get(key), coord, times) for key, coord in _RANGE_KEYS.items()}
+
+
+class _Group:
+    """一组可以合并读取的请求及其并集包络"""
+
+    def __init__(self, req: _Request):
+        self.members: List[_Request] = [req]
+        self.box: Dict[str, tuple | None] = dict(req.box)
+        vars_ = req.kwargs.get("vars")
+        self.vars: set | None = set(vars_) if vars_ else None
+
+    def overlaps(self, req: _Request) -> bool:
+        for coord, a in self.box.items():
+            b = req.box[coord]
+            if a is None or b is None:
+                continue
+            if a[1] < b[0] or b[1] < a[0]:
+                return False
+        return True
+
+    def add(self, req: _Request):
+        # 先算出新包络再整体替换，比较出错时组保持原样
+        box = {
+            coord: None if a is None or req.box[coord] is None
+            else (min(a[0], req.box[coord][0]), max(a[1], req.box[coord][1]))
+            for coord, a in self.box.items()
+        }
+        vars_ = req.kwargs.get("vars")
+        self.box = box
+        if self.vars is not None:
+            self.vars = None if not vars_ else self.vars | set(vars_)
+        self.members.append(req)
+
+    @property
+    def unbounded(self) -> bool:
+        return all(b is None for b in self.box.values())
+
+
+def _envelope_sel(ds, box: Dict[str, tuple | None]) -> Dict[str, slice]:
+    """按坐标的实际升降序把包络区间转成 .sel 用的 slice"""
+    sel = {}
+    for coord, b in box.items():
+        if b is None or coord not in ds.coords:
+            continue
+        vals = ds[coord].values
+        descending = vals.size > 1 and vals[0] > vals[-1]
+        lo, hi = b
+        if coord == "valid_time":
+            lo, hi = np.datetime64(lo), np.datetime64(hi)
+        sel[coord] = slice(hi, lo) if descending else slice(lo, hi)
+    return sel
+
+
+# ──────────────── 调度器 ──────────────────────────────────────
+class RequestBatcher:
+    """
+    用法::
+
+        mz = open_dataset("era5")
+        batcher = RequestBatcher(mz, window=0.02)
+        payload = batcher.to_json(vars=["t"], time=(...), lat=(30, 20), lon=(110, 112))
+        ...
+        batcher.stats.as_dict()
+        batcher.close()
+
+    window     收集请求的时间窗（秒），从窗内第一条请求开始计时
+    max_batch  单个时间窗最多收集的请求数，达到即提前触发
+    max_bytes  合并读取的包络上限（字节），超过则该组逐个直接查询
+    timeout    subset() / to_json() 等待结果的秒数，None ⇒ 不限
+    """
+
+    def __init__(
+        self,
+        mz: MZDataset,
+        *,
+        window: float = 0.02,
+        max_batch: int = 256,
+        max_bytes: int = 256 * 2**20,
+        timeout: float | None = 60.0,
+    ):
+        self.mz        = mz
+        self.window    = window
+        self.max_batch = max_batch
+        self.max_bytes = max_bytes
+        self.timeout   = timeout
+        self.stats     = BatchStats()
+
+        self._pending: List[_Request] = []
+        self._cond    = threading.Condition()
+        self._closed  = False
+        self._worker  = threading.Thread(target=self._run, name="metazarr-batcher", daemon=True)
+        self._worker.start()
+
+    # ---------- 对外 API ----------
+    def submit(self, kind: str, **kwargs) -> Future:
+        if kind not in {"subset", "to_json"}:
+            raise ValueError(f"不支持的请求类型 {kind!r}")
+        req = _Request(kind, kwargs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("RequestBatcher 已关闭")
+            self._pending.append(req)
+            self.stats.requests += 1
+            self._cond.notify()
+        return req.future
+
+    def subset(self, **kwargs):
+        return self.submit("subset", **kwargs).result(self.timeout)
+
+    def to_json(self, **kwargs):
+        return self.submit("to_json", **kwargs).result(self.timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- 后台线程 ----------
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                deadline = time.monotonic() + self.window
+                while (len(self._pending) < self.max_batch and not self._closed):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[: self.max_batch]
+                del self._pending[: self.max_batch]
+                self.stats.batches += 1
+            try:
+                self._dispatch(batch)
+            except Exception as exc:                     # 兜底：任何意外都不能让后台线程退出
+                log.exception("批处理调度失败")
+                for req in batch:
+                    if not req.future.done():
+                        req.future.set_exception(exc)
+
+    def _dispatch(self, batch: List[_Request]):
+        ds = self.mz._ds
+        times = ds.indexes.get("valid_time")
+        groups: List[_Group] = []
+        direct: List[_Request] = []
+        for req in batch:
+            try:                                         # 参数非法 → 只让这一个请求失败
+                unknown = set(req.kwargs.get("vars") or ()) - set(ds.data_vars)
+                if unknown:
+                    raise KeyError(f"变量不存在: {sorted(unknown)}")
+                req.box = _box_of(req.kwargs, times)
+                if () in req.box.values():               # 选区为空：不参与合并，原样交给 MZDataset
+                    direct.append(req)
+                    continue
+                for g in groups:
+                    if g.overlaps(req):
+                        g.add(req)
+                        break
+                else:
+                    groups.append(_Group(req))
+            except Exception as exc:
+                req.future.set_exception(exc)
+
+        self.stats.reads += len(direct)
+        self._answer(self.mz, direct)
+
+        for g in groups:
+            try:
+                loaded = self._read(g)
+            except Exception as exc:                     # 整组读取失败 → 每个请求都拿到异常
+                self.stats.reads += 1
+                for req in g.members:
+                    req.future.set_exception(exc)
+                continue
+            if loaded is None:                           # 不合并：逐个直接查询
+                self.stats.reads += len(g.members)
+                self._answer(self.mz, g.members)
+            else:
+                self.stats.reads += 1
+                self._answer(loaded, g.members)
+
+        log.debug("批处理 %d 个请求 → %d 组", len(batch), len(groups))
+
+    @staticmethod
+    def _answer(source: MZDataset, members: List[_Request]):
+        for req in members:
+            try:
+                if req.kind == "subset":
+                    req.future.set_result(source.subset(**req.kwargs))
+                else:
+                    req.future.set_result(source.to_json(**req.kwargs))
+            except Exception as exc:
+                req.future.set_exception(exc)
+
+    def _read(self, g: _Group) -> MZDataset | None:
+        """
+        一次性读取组的并集包络，返回驻留内存的 MZDataset；
+        包络不受限或超过 max_bytes 时返回 None（由调用方逐个直接查询）。
+        """
+        if g.unbounded:
+            return None
+        ds = self.mz._ds if g.vars is None else self.mz._ds[sorted(g.vars)]
+        ds = ds.sel(**_envelope_sel(ds, g.box))
+        if ds.nbytes > self.max_bytes:
+            return None
+        return MZDataset(ds.load(**compute_kwargs("query")), self.mz.meta)
@@ -1,10 +1,16 @@
 import argparse, sys, json, pathlib
 from .creator import create_dataset
+from .compactor import compact_dataset
 from .catalog import list_datasets, show_dataset_info
-from .config import DataKind, RawFormat, OrgMode
+from .config import DataKind, RawFormat, OrgMode, Scheduler
+from .executor import configure_executor, shutdown_executor
 
 def main():
     parser = argparse.ArgumentParser(description="metazarr command‑line interface")
+    parser.add_argument("--scheduler", choices=list(Scheduler),
+                        help="dask 执行后端（缺省沿用 dask 默认线程调度；只给 --workers 时为 threads）")
+    parser.add_argument("--workers", type=int, help="每个操作的 worker 数")
+    parser.add_argument("--memory-limit", help="每个 worker 内存上限，如 4GB（需 --scheduler distributed）")
     sub = parser.add_subparsers(dest="cmd")
 
     # create
@@ -24,8 +30,24 @@ def main():
     p_info = sub.add_parser("info", help="数据集详情")
     p_info.add_argument("name")
 
+    # compact
+    p_compact = sub.add_parser("compact", help="合并 cycle store 为周期 store")
+    p_compact.add_argument("name")
+    p_compact.add_argument("--org", choices=list(OrgMode), help="目标粒度，缺省取 catalog 中的 org_mode")
+
     args = parser.parse_args()
 
+    if args.memory_limit and args.scheduler != Scheduler.DISTRIBUTED.value:
+        parser.error("--memory-limit 仅在 --scheduler distributed 时生效")
+    if args.workers and not args.scheduler:
+        args.scheduler = Scheduler.THREADS.value
+    if args.scheduler:
+        configure_executor(
+            Scheduler(args.scheduler),
+            workers=args.workers,
+            memory_limit=args.memory_limit,
+        )
+
     if args.cmd == "create":
         create_dataset(
             data_kind=DataKind(args.kind),
@@ -36,6 +58,8 @@ def main():
             org_mode=OrgMode(args.org),
             name=args.name,
         )
+    elif args.cmd == "compact":
+        compact_dataset(args.name, org_mode=OrgMode(args.org) if args.org else None)
     elif args.cmd == "ls":
         for n in list_datasets():
             print(n)
@@ -44,5 +68,7 @@ def main():
     else:
         parser.print_help()
 
+    shutdown_executor()
+
 if __name__ == "__main__":
     sys.exit(main())
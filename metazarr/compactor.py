@@ -0,0 +1,219 @@
+"""
+compactor.py
+维护：把追加模式产生的大量 {cycle}.zarr 合并为按周期 (day/week/month/year/all) 的大 store
+
+周期 store 命名为 {起始时刻 YYYYMMDDHH}_{粒度}.zarr，如 2024072900_week.zarr：
+不会与 8 / 10 位的 cycle store（YYYYMMDD / YYYYMMDDHH）重名。
+
+每组单独提交，根目录始终在原位可读，任何时刻中断都能重跑恢复：
+  1) 组内 store 流式 open_mfdataset → 重新分块（valid_time 按 _TIME_CHUNK_BYTES 聚合，
+     不再一个时刻一个 chunk 文件）→ 写隐藏临时 store（consolidated）
+  2) 写入提交标记（记录 sources）后 rename 进根目录；此后读取端忽略这些 sources
+  3) 删除 sources，再清掉标记里的 sources
+重跑时 _recover 先把上次中断的组推进到完成，或丢弃没写完的临时 store。
+粒度只能按日历嵌套变粗（周 store 跨月 / 跨年，不能再并入 month / year），否则报错。
+"""
+from __future__ import annotations
+import math
+import os
+import re
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from .config import OrgMode
+from .creator import _auto_chunks, _write_zarr
+from .executor import compute_kwargs, open_mfdataset
+from .exceptions import ValidationError
+from .utils import (
+    log,
+    load_catalog,
+    save_catalog,
+    is_committed,
+    read_marker,
+    mark_committed,
+    tmp_store,
+    timestamp,
+    TMP_SUFFIX,
+)
+
+_PERIODS = [OrgMode.DAILY, OrgMode.WEEKLY, OrgMode.MONTHLY, OrgMode.YEARLY, OrgMode.ALLIN1]
+
+# store 名：8 / 10 位起报时（cycle store），或 {10 位起始时刻}_{粒度}（周期 store）
+_STORE_RE = re.compile(
+    rf"^(?:(?P<start>\d{{10}})_(?P<org>{'|'.join(o.value for o in _PERIODS)})"
+    rf"|(?P<cycle>\d{{8}}(?:\d{{2}})?))$"
+)
+
+# 源粒度（None = cycle）→ 可以整体并入的目标粒度
+_NESTS = {
+    None:            set(_PERIODS),
+    OrgMode.DAILY:   set(_PERIODS),
+    OrgMode.WEEKLY:  {OrgMode.WEEKLY, OrgMode.ALLIN1},
+    OrgMode.MONTHLY: {OrgMode.MONTHLY, OrgMode.YEARLY, OrgMode.ALLIN1},
+    OrgMode.YEARLY:  {OrgMode.YEARLY, OrgMode.ALLIN1},
+    OrgMode.ALLIN1:  {OrgMode.ALLIN1},
+}
+
+_RETIRED = f".retired{TMP_SUFFIX}"
+
+# 合并后 valid_time 方向每个 chunk 的目标大小（未压缩）
+_TIME_CHUNK_BYTES = 64 * 2**20
+
+
+def _period_start(t: datetime, org: OrgMode) -> datetime:
+    day = t.replace(hour=0)
+    if org is OrgMode.DAILY:
+        return day
+    if org is OrgMode.WEEKLY:                           # 以周一为起点
+        return day - timedelta(days=day.weekday())
+    if org is OrgMode.MONTHLY:
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)                  # YEARLY
+
+
+def _plan(stores: List[Path], org: OrgMode) -> Dict[str, List[Path]]:
+    """目标 store 名 → 组内源 store；有不能嵌套进 org 的周期 store 时报错"""
+    groups: Dict[datetime | None, List[Path]] = {}
+    starts: Dict[Path, datetime] = {}
+    for p in stores:
+        m = _STORE_RE.match(p.stem)
+        if not m:                                        # 非 metazarr 命名的 store 原样保留
+            continue
+        stamp = m["start"] or m["cycle"]
+        try:
+            t = datetime.strptime(stamp, "%Y%m%d%H" if len(stamp) == 10 else "%Y%m%d")
+        except ValueError:                               # 形似日期但不合法，原样保留
+            continue
+        src = OrgMode(m["org"]) if m["org"] else None
+        if org not in _NESTS[src]:
+            raise ValidationError(
+                f"{p.name} 是 {src.value} 粒度，会跨越 {org.value} 的周期边界，不能合并为 {org.value}"
+            )
+        starts[p] = t
+        groups.setdefault(None if org is OrgMode.ALLIN1 else _period_start(t, org), []).append(p)
+    if None in groups:                                   # ALLIN1 用最早的起始时刻命名
+        members = groups.pop(None)
+        groups[min(starts[p] for p in members)] = members
+    return {f"{start:%Y%m%d%H}_{org.value}.zarr": sorted(members, key=lambda p: (starts[p], p.name))
+            for start, members in groups.items()}
+
+
+def _compact_chunks(ds) -> dict:
+    """空间维沿用 _auto_chunks；valid_time 取尽量多的时刻，使单个 chunk 不超过 _TIME_CHUNK_BYTES"""
+    chunks = _auto_chunks(ds)
+    if "valid_time" in ds.dims:
+        per_step = max(
+            (v.dtype.itemsize * math.prod(chunks.get(d, n) for d, n in v.sizes.items() if d != "valid_time")
+             for v in ds.data_vars.values() if "valid_time" in v.dims),
+            default=1,
+        )
+        chunks["valid_time"] = min(ds.sizes["valid_time"], max(1, _TIME_CHUNK_BYTES // per_step))
+    return chunks
+
+
+# ──────────────── 单组提交 / 中断恢复 ─────────────────────────
+def _retired(store: Path) -> Path:
+    return store.parent / f".{store.name}{_RETIRED}"
+
+
+def _install(tmp: Path, final: Path):
+    """已提交的 tmp 换入 final；同名旧 store（本组的 source）先退役到隐藏目录"""
+    if final.exists():
+        os.replace(final, _retired(final))
+    os.replace(tmp, final)
+
+
+def _finish(store: Path):
+    """删除已被 store 取代的 sources 与退役目录，最后清掉标记里的 sources"""
+    marker = read_marker(store) or {}
+    for src in marker.pop("sources", []):
+        if src != store.name:
+            shutil.rmtree(store.parent / src, ignore_errors=True)
+    shutil.rmtree(_retired(store), ignore_errors=True)
+    marker.pop("committed", None)
+    mark_committed(store, **marker)
+
+
+def _recover(root: Path):
+    """把上次中断的合并推进到一致状态；只处理周期 store，入库中的 cycle 临时 store 不动"""
+    for tmp in root.glob(f".*.zarr{TMP_SUFFIX}"):
+        final = root / tmp.name[1:-len(TMP_SUFFIX)]
+        m = _STORE_RE.match(final.stem)
+        if not m or not m["org"]:
+            continue
+        if is_committed(tmp):
+            log.info("♻️  恢复上次中断的合并：%s", final.name)
+            _install(tmp, final)
+        else:
+            shutil.rmtree(tmp)
+    for retired in root.glob(f".*.zarr{_RETIRED}"):
+        final = root / retired.name[1:-len(_RETIRED)]
+        if not final.exists():                           # 新版本没换进来 → 旧版本放回
+            os.replace(retired, final)
+    for p in root.glob("*.zarr"):
+        if (read_marker(p) or {}).get("sources") or _retired(p).exists():
+            _finish(p)
+
+
+def _merge_group(members: List[Path], final: Path):
+    ds = open_mfdataset(
+        [str(p) for p in members],
+        operation="ingest",
+        engine="zarr",
+        concat_dim="valid_time",
+        coords="minimal",
+        chunks={},
+        backend_kwargs={"consolidated": False},
+    ).sortby("valid_time")                           # 补写的 cycle 可能晚于同名周期 store 排在后面
+    for v in ds.variables.values():                  # 丢弃源 store 的分块编码，按新布局写出
+        v.encoding.pop("chunks", None)
+        v.encoding.pop("preferred_chunks", None)
+        if v.dtype.kind == "M":                      # 时间单位按合并后的范围重新选择
+            v.encoding.pop("units", None)
+    tmp = tmp_store(final)
+    _write_zarr(ds, tmp, consolidate=True, chunks=_compact_chunks(ds), **compute_kwargs("ingest"))
+    mark_committed(tmp, sources=[p.name for p in members])
+    _install(tmp, final)
+    _finish(final)
+
+
+def compact_dataset(name: str, *, org_mode: OrgMode | None = None) -> Path:
+    """
+    合并数据集 name 的 store。
+    org_mode  目标粒度，缺省取 catalog 中的 org_mode；已有的周期 store 必须能整体嵌套进去。
+    返回数据集根目录 Path（路径不变）。中断后直接重跑即可。
+    """
+    cat = load_catalog()
+    meta = cat.get(name)
+    if not meta:
+        raise ValidationError(f"数据集 {name} 不存在")
+
+    root = Path(meta["path"])
+    org = OrgMode(org_mode or meta["org_mode"])
+    if org is OrgMode.HOURLY:
+        raise ValidationError("org_mode=xhour 无需合并")
+    if not root.is_dir() or root.suffix == ".zarr":
+        raise ValidationError(f"{root} 不是多 store 目录，无需合并")
+
+    _recover(root)
+    stores = sorted(p for p in root.glob("*.zarr") if not p.name.startswith("."))
+    groups = _plan(stores, org)
+    todo = {target: m for target, m in groups.items()
+            if len(m) > 1 or m[0].name != target}
+    if not todo:
+        log.info("数据集 %s 已是 %s 粒度，无需合并", name, org.value)
+        return root
+
+    for i, (target, members) in enumerate(sorted(todo.items()), 1):
+        log.info("🗜️  [%d/%d] 合并 %d 个 store → %s", i, len(todo), len(members), target)
+        _merge_group(members, root / target)
+
+    cat = load_catalog()
+    cat[name].update(org_mode=org.value, compacted=timestamp())
+    save_catalog(cat)
+    merged = sum(len(m) for m in todo.values())
+    log.info("✅ 数据集 %s 合并完成：%d 个 store → %d 个", name, len(stores),
+             len(stores) - merged + len(todo))
+    return root
@@ -27,9 +27,14 @@ class OutputFormat(str, Enum):
     NETCDF = "netcdf"
     HDF   = "hdf"
 
+class Scheduler(str, Enum):
+    THREADS     = "threads"
+    PROCESSES   = "processes"
+    DISTRIBUTED = "distributed"
+
 # ─── 文件名与文件夹名正则 ───────────────────────────────────────────────────────
 FILENAME_RE = re.compile(
-    r"^(?:(?P<var>[A-Za-z0-9]+))?"
+    r"^(?:(?P<var>[A-Za-z][A-Za-z0-9]*?))?"   # 变量名须以字母开头，非贪婪，避免吞掉日期
     r"(?P<datetime>\d{8,10})"      # YYYYMMDDHH
     r"(?:\.(?P<step>\d{3}))?"    # .FFF 可选
     r"\.(?P<suffix>grb|nc|hdf)$",
@@ -38,8 +43,18 @@ FILENAME_RE = re.compile(
 
 FOLDERNAME_RE = re.compile(r"^\d{10}$")  # YYYYMMDDHH
 
+# 各原始格式对应的文件后缀（与 FILENAME_RE 一致，扫描阶段提前过滤）
+RAW_SUFFIXES = {
+    RawFormat.GRIB:   {".grb"},
+    RawFormat.NETCDF: {".nc"},
+    RawFormat.HDF:    {".hdf"},
+}
+
 # ─── 默认 Zarr 压缩器示例 ───────────────────────────────────────────────────────
 import numcodecs
 DEFAULT_COMPRESSOR = numcodecs.Blosc(cname="zstd", clevel=3, shuffle=2)
 
-CATALOG_PATH = Path.home() / ".metazarr_catalog.json"
\ No newline at end of file
+CATALOG_PATH = Path.home() / ".metazarr_catalog.json"
+
+# 原始文件头索引缓存（含 cfgrib 的 .idx）
+INDEX_DIR = Path.home() / ".metazarr_index"
\ No newline at end of file
@@ -17,17 +17,23 @@ from .config import *
 from .utils import (
     log,
     ensure_empty_dir,
+    is_committed,
+    tmp_store,
+    commit_store,
     scan_files,
     load_catalog,
     save_catalog,
     timestamp,
 )
 from .exceptions import ValidationError, ConversionError
+from .executor import compute_kwargs, inner_compute_kwargs, open_mfdataset
+from .index import HeaderIndex, cfgrib_indexpath
 
 # ──────────────── 内部小工具 ──────────────────────────────────
 def _open_raw(path: Path, fmt: RawFormat) -> xr.Dataset:
     if fmt is RawFormat.GRIB:
-        return xr.open_dataset(path, engine="cfgrib", chunks={}, backend_kwargs={"indexpath": ""})
+        return xr.open_dataset(path, engine="cfgrib", chunks={},
+                               backend_kwargs={"indexpath": cfgrib_indexpath(path)})
     if fmt is RawFormat.NETCDF:
         return xr.open_dataset(path, engine="netcdf4", chunks={})
     if fmt is RawFormat.HDF:
@@ -46,17 +52,28 @@ def _auto_chunks(ds: xr.Dataset) -> dict:
             chunks[dim] = min(n, 360)
     return chunks
 
-def _write_zarr(ds: xr.Dataset, target: Path, consolidate: bool = True):
+def _write_zarr(
+    ds: xr.Dataset, target: Path, consolidate: bool = True, chunks: dict | None = None, **compute_kw
+):
+    """chunks 缺省按 _auto_chunks；compute_kw 原样传给写入的 .compute()（scheduler / pool）"""
     t0 = time.time()
-    ds.chunk(_auto_chunks(ds)).to_zarr(
+    ds.chunk(chunks or _auto_chunks(ds)).to_zarr(
         str(target),
         mode="w",
-        compute=True,
+        compute=False,
         consolidated=consolidate,
         encoding={v: {"compressor": DEFAULT_COMPRESSOR} for v in ds.data_vars},
-    )
+    ).compute(**compute_kw)
     log.info("✅ 写入 %s (%.1fs)", target.name, time.time() - t0)
 
+def _write_and_commit(ds: xr.Dataset, final: Path, consolidate: bool = True, **compute_kw):
+    """写到临时 store，完成后带标记原子 rename；中断只会留下可丢弃的 *.tmp"""
+    tmp = tmp_store(final)
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    _write_zarr(ds, tmp, consolidate=consolidate, **compute_kw)
+    commit_store(tmp, final)
+
 
 # ──────────────── catalog 写入统一函数 ────────────────────────
 def _update_catalog(
@@ -137,13 +154,12 @@ def create_dataset(
         if not zarr_stores:
             raise ValidationError(f"{root} 下未发现 *.zarr 目录")
 
-        ds_all = xr.open_mfdataset(
+        ds_all = open_mfdataset(
             [str(p) for p in zarr_stores],
+            operation="ingest",
             engine="zarr",
             concat_dim="time",
-            combine="nested",
             coords="minimal",
-            parallel=True,
             backend_kwargs={"consolidated": False},
         )
         time_coord = "valid_time" if "valid_time" in ds_all.coords else (
@@ -172,10 +188,11 @@ def create_dataset(
 
     # ────────────── GRIB/NetCDF/HDF ➜ Zarr 转换 ──────────────
     dst_path = Path(dst_path) if dst_path else Path(f"./{name}_zarr")
-    ensure_empty_dir(dst_path)
+    # 允许目录里已有上次中断前提交的 store → 断点续传
+    ensure_empty_dir(dst_path, resumable=True)
 
     log.info("扫描原始文件…")
-    files = list(scan_files([Path(p) for p in src_paths]))
+    files = list(scan_files([Path(p) for p in src_paths], suffixes=RAW_SUFFIXES[raw_format]))
     if not files:
         raise ValidationError("未找到任何原始文件")
 
@@ -191,14 +208,47 @@ def create_dataset(
         parsed.setdefault(cycle_key, {}).setdefault(gd["var"] or "var", []).append(
             dict(path=f, step=gd.get("step"))
         )
-    all_cycles = sorted(parsed.keys())     # ['2024070100', '2024070200', ...] 或 ['20240701', '20240702', ...]
-    start_cycle = all_cycles[0]
-    end_cycle   = all_cycles[-1]
     if not parsed:
         raise ValidationError("没有文件符合命名规范")
 
+    # allow_update ⇒ 每个起报时一个 {cycle}.zarr，逐个提交；否则整个 dst_path 为一个提交单元
+    def _final(cycle: str) -> Path:
+        return dst_path / f"{cycle}.zarr" if allow_update else dst_path
+
+    # 已提交的 cycle 直接跳过：不索引、不打开
+    committed = sorted(c for c in parsed if is_committed(_final(c)))
+    pending = {c: vm for c, vm in parsed.items() if c not in committed}
+    if committed:
+        log.info("⏭️  跳过 %d 个已提交的 cycle，剩余 %d 个待写入", len(committed), len(pending))
+
+    # GRIB：先为待写入文件建好持久 .idx（缓存命中的不再重扫），_open_raw 打开时直接复用。
+    # 文件头读不出的 cycle 本次不写、不提交，其余 cycle 照常写完后报错，重跑时会重试这些 cycle。
+    # NetCDF/HDF 打开本身就只读文件头，不需要额外的索引。
+    failed: Dict[str, List[Path]] = {}
+    if raw_format is RawFormat.GRIB:
+        index = HeaderIndex()
+        headers = index.update(
+            [it["path"] for vm in pending.values() for lst in vm.values() for it in lst], raw_format)
+        index.save()
+        for cycle, var_map in list(pending.items()):
+            bad = [it["path"] for lst in var_map.values() for it in lst if headers[it["path"]] is None]
+            if bad:
+                failed[cycle] = bad
+                del pending[cycle]
+
+    all_cycles = sorted(parsed)            # ['2024070100', '2024070200', ...] 或 ['20240701', '20240702', ...]
+    start_cycle = all_cycles[0]
+    end_cycle   = all_cycles[-1]
+
+    single_tmp = None if allow_update else tmp_store(dst_path)
+    if single_tmp is not None and single_tmp.exists() and pending:
+        shutil.rmtree(single_tmp)
+
     tasks = []
-    for cycle, var_map in parsed.items():
+    ds_cycle = None
+    inner_kw = inner_compute_kwargs()          # 池内任务里的写入同步执行，不回头占用同一个池
+    for cycle, var_map in pending.items():
+        final = _final(cycle)
         pieces_each_var = []
         for var, lst in var_map.items():
             subpieces = []
@@ -211,16 +261,23 @@ def create_dataset(
             pieces_each_var.append(xr.concat(subpieces, dim=concat_dim))
         ds_cycle = xr.merge(pieces_each_var)
 
-        tgt = dst_path / (f"{cycle}.zarr" if allow_update else ".")
-        if tgt.suffix != ".zarr":
-            tgt = dst_path
+        if allow_update:
+            tasks.append(dask.delayed(_write_and_commit)(ds_cycle, final, consolidate=False, **inner_kw))
         else:
-            tgt.mkdir(parents=True, exist_ok=True)
-
-        tasks.append(dask.delayed(_write_zarr)(ds_cycle, tgt, consolidate=not allow_update))
+            tasks.append(dask.delayed(_write_zarr)(ds_cycle, single_tmp, consolidate=True, **inner_kw))
 
     with ProgressBar():
-        dask.compute(*tasks)
+        dask.compute(*tasks, **compute_kwargs("ingest"))
+    if failed:
+        raise ConversionError(
+            "以下 cycle 的原始文件读取失败，未写入（修复后重跑即可补写）: "
+            + "; ".join(f"{c}: {', '.join(map(str, fs))}" for c, fs in sorted(failed.items()))
+        )
+    if tasks and not allow_update:
+        commit_store(single_tmp, dst_path)
+
+    if ds_cycle is None:                       # 全部已提交：从最后一个 store 读取元信息
+        ds_cycle = xr.open_zarr(str(_final(committed[-1])), consolidated=False)
 
     _update_catalog(
         name=name,
@@ -0,0 +1,214 @@
+"""
+executor.py
+常驻执行后端：threads / processes / 本地 distributed 集群
+
+长期运行的服务里，入库 (ingest) 与检索 (query) 共用同一个隐式线程池会互相抢占。
+这里按"操作"各自维护一个持久的 worker 池，跨调用复用：
+
+    configure_executor(Scheduler.PROCESSES,
+                       limits={"ingest": OperationLimits(workers=4),
+                               "query":  OperationLimits(workers=8)})
+    dask.compute(*tasks, **compute_kwargs("ingest"))
+
+池只通过每次 compute 的参数显式传入，从不写进 dask 全局配置：
+dask.config 是进程级的，多线程并发入库/检索时会互相覆盖。
+未调用 configure_executor 时 compute_kwargs 返回 {}，保持 dask 默认行为。
+"""
+from __future__ import annotations
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Sequence
+
+import dask
+import xarray as xr
+
+from .config import Scheduler
+from .utils import log
+from .exceptions import ValidationError
+
+OPERATIONS = ("ingest", "query")
+
+
+@dataclass
+class OperationLimits:
+    workers:      int | None = None          # None ⇒ CPU 核数
+    memory_limit: str | int | None = None    # 如 "4GB"；仅 distributed 下强制生效
+
+
+class ExecutionBackend:
+    """按操作划分、惰性创建并持久复用的 dask 执行池"""
+
+    def __init__(
+        self,
+        scheduler: Scheduler = Scheduler.THREADS,
+        *,
+        limits: Dict[str, OperationLimits] | None = None,
+    ):
+        self.scheduler = Scheduler(scheduler)
+        self.limits    = {op: OperationLimits() for op in OPERATIONS}
+        self.limits.update(limits or {})
+        self._pools: Dict[str, object] = {}
+        self._io_pools: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+        if self.scheduler is not Scheduler.DISTRIBUTED and any(
+            lim.memory_limit for lim in self.limits.values()
+        ):
+            log.warning("memory_limit 仅在 scheduler=distributed 时生效，已忽略")
+
+    # ---------- 池的创建 ----------
+    def _pool(self, operation: str):
+        with self._lock:
+            if operation not in self._pools:
+                self._pools[operation] = self._make_pool(operation)
+            return self._pools[operation]
+
+    def _workers(self, operation: str) -> int:
+        lim = self.limits.get(operation) or OperationLimits()
+        return lim.workers or os.cpu_count() or 1
+
+    def _io_pool(self, operation: str) -> ThreadPoolExecutor:
+        """打开文件等只返回惰性对象的 IO 任务：各后端统一用线程"""
+        with self._lock:
+            if operation not in self._io_pools:
+                self._io_pools[operation] = ThreadPoolExecutor(
+                    self._workers(operation), thread_name_prefix=f"metazarr-{operation}-io")
+            return self._io_pools[operation]
+
+    def _make_pool(self, operation: str):
+        lim = self.limits.get(operation) or OperationLimits()
+        workers = self._workers(operation)
+        log.info("⚙️  启动 %s 执行池 [%s] workers=%d", self.scheduler.value, operation, workers)
+
+        if self.scheduler is Scheduler.THREADS:
+            return ThreadPoolExecutor(workers, thread_name_prefix=f"metazarr-{operation}")
+        if self.scheduler is Scheduler.PROCESSES:
+            ctx = multiprocessing.get_context(dask.config.get("multiprocessing.context", "spawn"))
+            return ProcessPoolExecutor(workers, mp_context=ctx)
+
+        try:
+            from distributed import Client, LocalCluster
+        except ImportError as e:
+            raise ValidationError(
+                "scheduler=distributed 需要安装 dask.distributed：pip install 'dask[distributed]'"
+            ) from e
+        cluster = LocalCluster(
+            n_workers=workers,
+            threads_per_worker=1,
+            processes=True,
+            memory_limit=lim.memory_limit or "auto",
+        )
+        return Client(cluster, set_as_default=False)
+
+    # ---------- 使用 ----------
+    def compute_kwargs(self, operation: str) -> dict:
+        """传给 dask.compute / .compute() / .load() 的调度参数"""
+        pool = self._pool(operation)
+        if self.scheduler is Scheduler.DISTRIBUTED:
+            return {"scheduler": pool}
+        return {"scheduler": self.scheduler.value, "pool": pool}
+
+    def map(self, operation: str, fn: Callable, items: Iterable) -> List:
+        return list(self._io_pool(operation).map(fn, items))
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+            io_pools, self._io_pools = self._io_pools, {}
+        for pool in io_pools.values():
+            pool.shutdown(wait=True)
+        for pool in pools.values():
+            if self.scheduler is Scheduler.DISTRIBUTED:
+                cluster = pool.cluster
+                pool.close()
+                cluster.close()
+            else:
+                pool.shutdown(wait=True)
+
+
+# ──────────────── 进程级单例 ──────────────────────────────────
+_BACKEND: ExecutionBackend | None = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def configure_executor(
+    scheduler: Scheduler | str = Scheduler.THREADS,
+    *,
+    workers: int | None = None,
+    memory_limit: str | int | None = None,
+    limits: Dict[str, OperationLimits] | None = None,
+) -> ExecutionBackend:
+    """
+    设置（或替换）进程内常驻执行后端。
+    workers / memory_limit 作为所有操作的默认值，limits 可按操作单独覆盖。
+    """
+    global _BACKEND
+    merged = {op: OperationLimits(workers, memory_limit) for op in OPERATIONS}
+    merged.update(limits or {})
+    backend = ExecutionBackend(Scheduler(scheduler), limits=merged)
+    with _BACKEND_LOCK:
+        old, _BACKEND = _BACKEND, backend
+    if old is not None:
+        old.close()
+    return backend
+
+
+def get_executor() -> ExecutionBackend | None:
+    return _BACKEND
+
+
+def shutdown_executor():
+    global _BACKEND
+    with _BACKEND_LOCK:
+        old, _BACKEND = _BACKEND, None
+    if old is not None:
+        old.close()
+
+
+def compute_kwargs(operation: str) -> dict:
+    """当前后端在 operation 池上的调度参数；未配置后端时为 {}"""
+    backend = _BACKEND
+    return backend.compute_kwargs(operation) if backend else {}
+
+
+def inner_compute_kwargs() -> dict:
+    """
+    已在 worker 池任务内部再触发的 compute（如 delayed 任务里的 to_zarr）：
+    配置了后端时同步执行，避免占着池里的线程去等同一个池 → 死锁。
+    """
+    return {"scheduler": "synchronous"} if _BACKEND else {}
+
+
+def open_mfdataset(
+    paths: Sequence[str],
+    *,
+    operation: str,
+    concat_dim: str,
+    coords: str = "minimal",
+    **open_kwargs,
+) -> xr.Dataset:
+    """
+    combine="nested" 的 open_mfdataset；配置了后端时在 operation 的 IO 线程池上并行打开，
+    否则沿用 xarray 的 parallel=True（dask 默认调度）。
+    """
+    backend = _BACKEND
+    if backend is None:
+        return xr.open_mfdataset(
+            paths, concat_dim=concat_dim, combine="nested", coords=coords,
+            parallel=True, **open_kwargs,
+        )
+    open_kwargs.setdefault("chunks", {})
+    datasets = backend.map(operation, lambda p: xr.open_dataset(p, **open_kwargs), paths)
+    try:
+        # 与 xr.open_mfdataset 的默认值保持一致：属性取第一个文件的，而不是 combine_nested 默认的丢弃
+        combined = xr.combine_nested(
+            datasets, concat_dim=concat_dim, coords=coords, combine_attrs="override")
+    except Exception:
+        for ds in datasets:
+            ds.close()
+        raise
+    combined.set_close(lambda: [ds.close() for ds in datasets])
+    return combined
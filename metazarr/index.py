@@ -0,0 +1,118 @@
+"""
+index.py
+原始文件头索引：变量 / 层次 / 预报时效
+
+按 (path, mtime, size) 缓存在 INDEX_DIR 下，重复入库或追加时，
+未变化的文件直接命中缓存，不再重新扫描、解码。
+GRIB 的消息级字节偏移由 cfgrib 自己的 .idx 保存（见 cfgrib_indexpath）：
+读文件头时建一次，之后 _open_raw 打开同一文件直接复用，不再重扫消息。
+入库只对 GRIB 建索引；NetCDF/HDF 打开时本就只读文件头，再索引一遍只会多开一次文件。
+读取失败的文件不写入缓存，update 返回 None，下次重新读取。
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable
+
+import numpy as np
+import xarray as xr
+
+from .config import INDEX_DIR, RawFormat
+from .utils import log
+
+_LEVEL_NAMES = ("pressure_level", "isobaricInhPa", "level", "lev", "depth")
+_TIME_NAMES  = ("valid_time", "time")
+
+# eccodes 与 netCDF4/HDF5 的 C 库默认构建都非线程安全：文件头一律串行读取
+_HEADER_LOCK = threading.Lock()
+
+
+def cfgrib_indexpath(path: Path) -> str:
+    """每个 GRIB 文件在 INDEX_DIR/cfgrib 下对应一个稳定的 .idx 模板"""
+    digest = hashlib.sha1(str(Path(path).resolve()).encode()).hexdigest()
+    (INDEX_DIR / "cfgrib").mkdir(parents=True, exist_ok=True)
+    return str(INDEX_DIR / "cfgrib" / f"{digest}.{{short_hash}}.idx")
+
+
+# ──────────────── 读取单个文件头 ──────────────────────────────
+def read_header(path: Path, fmt: RawFormat) -> Dict:
+    engine = {RawFormat.GRIB: "cfgrib", RawFormat.NETCDF: "netcdf4", RawFormat.HDF: "h5netcdf"}[fmt]
+    kw = {"backend_kwargs": {"indexpath": cfgrib_indexpath(path)}} if fmt is RawFormat.GRIB else {}
+    with _HEADER_LOCK, xr.open_dataset(path, engine=engine, **kw) as ds:
+        levels = next((ds[c].values for c in _LEVEL_NAMES if c in ds.coords), np.array([]))
+        times  = next((ds[c].values for c in _TIME_NAMES if c in ds.coords), np.array([]))
+        return {
+            "variables":   sorted(ds.data_vars),
+            "levels":      np.atleast_1d(levels).tolist(),
+            "valid_times": [str(t)[:19] for t in np.atleast_1d(times)],
+        }
+
+
+# ──────────────── 持久索引 ────────────────────────────────────
+class HeaderIndex:
+    """
+    以文件绝对路径为键的文件头缓存；mtime 或 size 变化即失效重建。
+    用法::
+
+        idx = HeaderIndex()
+        headers = idx.update(files, RawFormat.GRIB)   # {Path: header}
+        idx.save()
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = Path(path) if path else INDEX_DIR / "headers.json"
+        self._entries: Dict[str, Dict] = (
+            json.loads(self.path.read_text()) if self.path.exists() else {}
+        )
+        self._lock  = threading.Lock()
+        self._dirty = False
+
+    @staticmethod
+    def _stamp(path: Path) -> tuple:
+        st = path.stat()
+        return st.st_mtime_ns, st.st_size
+
+    def get(self, path: Path) -> Dict | None:
+        key = str(Path(path).resolve())
+        entry = self._entries.get(key)
+        if entry and (entry["mtime_ns"], entry["size"]) == self._stamp(Path(key)):
+            return entry
+        return None
+
+    def _build(self, path: Path, fmt: RawFormat) -> Dict | None:
+        key = str(Path(path).resolve())
+        mtime_ns, size = self._stamp(Path(key))
+        try:
+            header = read_header(Path(key), fmt)
+        except Exception as e:
+            log.warning("读取文件头失败 %s: %s", path, e)
+            return None
+        entry = dict(header, format=fmt.value, mtime_ns=mtime_ns, size=size)
+        with self._lock:
+            self._entries[key] = entry
+            self._dirty = True
+        return entry
+
+    def update(self, files: Iterable[Path], fmt: RawFormat) -> Dict[Path, Dict | None]:
+        """返回每个文件的 header；只读取缓存未命中的文件，读取失败为 None"""
+        files = list(files)
+        out: Dict[Path, Dict | None] = {f: self.get(f) for f in files}
+        missing = [f for f, entry in out.items() if entry is None]
+        if missing:
+            log.info("索引文件头：%d 个命中缓存，%d 个需读取", len(files) - len(missing), len(missing))
+            for f in missing:
+                out[f] = self._build(f, fmt)
+        return out
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".json.tmp")
+            tmp.write_text(json.dumps(self._entries, ensure_ascii=False))
+            os.replace(tmp, self.path)
+            self._dirty = False
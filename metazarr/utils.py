@@ -1,29 +1,114 @@
+from __future__ import annotations
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Sequence
+from typing import Iterable, Sequence
 import json
+import shutil
 from datetime import datetime, timezone, timedelta
 from .config import CATALOG_PATH
 
+COMMIT_MARKER = ".metazarr_commit"   # 写完的 store 内的提交标记
+TMP_SUFFIX    = ".tmp"               # 写入中的临时 store 后缀
+
 log = logging.getLogger("metazarr")
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(levelname)s %(message)s",
 )
 
-def ensure_empty_dir(path: Path):
+def ensure_empty_dir(path: Path, resumable: bool = False):
+    """
+    resumable=True 时允许目录中已有"上次中断留下的"内容：
+    带提交标记的 store（或目录本身即已提交的 store）以及 *.tmp 残留。
+    """
     if not path.exists():
         path.mkdir(parents=True, exist_ok=True)
-    elif any(path.iterdir()):
+        return
+    if resumable and is_committed(path):
+        return
+    for p in path.iterdir():
+        if resumable and (is_committed(p) or p.name.endswith(TMP_SUFFIX)):
+            continue
         raise ValueError(f"目标目录 {path} 必须为空。")
 
-def scan_files(paths: Sequence[Path]):
+def is_committed(store: Path) -> bool:
+    return (store / COMMIT_MARKER).is_file()
+
+def read_marker(store: Path) -> dict | None:
+    """store 的提交标记内容；未提交为 None"""
+    try:
+        return json.loads((store / COMMIT_MARKER).read_text())
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+def tmp_store(final: Path) -> Path:
+    """final 同目录下的隐藏临时路径，如 .2024070100.zarr.tmp（不会被 *.zarr 匹配）"""
+    return final.parent / f".{final.name}{TMP_SUFFIX}"
+
+def mark_committed(store: Path, **info):
+    """（原子地）写入或改写提交标记"""
+    marker = {"committed": timestamp(), **info}
+    tmp = store / f"{COMMIT_MARKER}{TMP_SUFFIX}"
+    tmp.write_text(json.dumps(marker, ensure_ascii=False))
+    os.replace(tmp, store / COMMIT_MARKER)
+
+def commit_store(tmp: Path, final: Path, **info):
+    """
+    写入提交标记后把 tmp 原子 rename 为 final。
+    final 若为空目录或未提交的残留，先清理掉。
+    """
+    mark_committed(tmp, **info)
+    if final.exists():
+        if final.is_dir() and not any(final.iterdir()):
+            final.rmdir()
+        elif not is_committed(final):
+            shutil.rmtree(final)
+        else:
+            raise ValueError(f"{final} 已提交，拒绝覆盖")
+    os.replace(tmp, final)
+
+def _scan_dir(path: Path):
+    """列出单个目录：返回 (子目录, 文件)"""
+    dirs, files = [], []
+    with os.scandir(path) as it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                dirs.append(Path(e.path))
+            elif e.is_file():
+                files.append(Path(e.path))
+    return dirs, files
+
+def scan_files(
+    paths: Sequence[Path],
+    suffixes: Iterable[str] | None = None,
+    workers: int = 8,
+):
+    """
+    并行遍历目录（按层把每个子目录的 scandir 分给线程池），
+    suffixes 给定时只产出后缀匹配（不区分大小写）的文件。
+    """
+    suffixes = {s.lower() for s in suffixes} if suffixes else None
+
+    def _keep(p: Path) -> bool:
+        return suffixes is None or p.suffix.lower() in suffixes
+
+    level = []
     for p in paths:
         if p.is_dir():
-            yield from p.rglob("*")
-        else:
+            level.append(p)
+        elif _keep(p):
             yield p
 
+    with ThreadPoolExecutor(workers) as pool:
+        while level:
+            nxt = []
+            for dirs, files in pool.map(_scan_dir, level):
+                nxt.extend(dirs)
+                yield from (f for f in files if _keep(f))
+            level = nxt
+
 def load_catalog():
     if CATALOG_PATH.exists():
         return json.loads(CATALOG_PATH.read_text())
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+import metazarr.index
+import metazarr.utils
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """隔离的工作目录：catalog 与文件头索引都写到 tmp_path 下"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(metazarr.utils, "CATALOG_PATH", tmp_path / "catalog.json")
+    monkeypatch.setattr(metazarr.index, "INDEX_DIR", tmp_path / "index")
+    return tmp_path
+
+
+def write_cycles(raw_dir, cycles, var="T"):
+    """每个起报时 (YYYYMMDDHH 或 YYYYMMDD) 写一个 {var}{cycle}.nc"""
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    for cycle in cycles:
+        fmt = "%Y%m%d%H" if len(cycle) == 10 else "%Y%m%d"
+        t = pd.to_datetime([cycle], format=fmt).values.astype("datetime64[ns]")
+        xr.Dataset(
+            {var: (("valid_time", "latitude", "longitude"), np.random.rand(1, 3, 4))},
+            coords={"valid_time": t, "latitude": [3.0, 1.5, 0.0], "longitude": [10, 20, 30, 40]},
+        ).to_netcdf(raw_dir / f"{var}{cycle}.nc")
+    return raw_dir
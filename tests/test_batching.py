@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from metazarr.accessor import MZDataset
+from metazarr.batching import RequestBatcher
+
+
+@pytest.fixture
+def mz():
+    ds = xr.Dataset(
+        {v: (("valid_time", "latitude", "longitude"), np.random.rand(8, 5, 6)) for v in ("t", "u")},
+        coords={
+            "valid_time": pd.date_range("2020-11-01", periods=8, freq="6h"),
+            "latitude": [40, 35, 30, 25, 20],
+            "longitude": np.arange(110, 116),
+        },
+    ).chunk({"valid_time": 1})
+    return MZDataset(ds, {})
+
+
+def test_overlapping_requests_are_coalesced(mz):
+    kws = [
+        dict(vars=["t"], time=("2020-11-01T00", "2020-11-01T12"), lat=(30, 20), lon=(110, 112)),
+        dict(vars=["u"], time=("2020-11-01T06", "2020-11-02T00"), lat=(35, 25), lon=(111, 113)),
+        dict(vars=["t"], time=("2020-11-02T12", "2020-11-02T18"), lat=(40, 40), lon=(115, 115),
+             orient="ndarray"),
+        # 只给日期：和 subset 一样按整天展开（11-01 00Z … 11-02 18Z 共 8 个时刻）
+        dict(vars=["t"], time=("2020-11-01", "2020-11-02"), lat=(25, 20), lon=(112, 112)),
+    ]
+    with RequestBatcher(mz, window=0.2) as b:
+        futures = [b.submit("to_json", **kw) for kw in kws]
+        results = [f.result(timeout=10) for f in futures]
+    assert results == [mz.to_json(**kw) for kw in kws]
+    assert len(results[-1]) == 8 * 2
+    assert b.stats.reads == 2 and b.stats.coalescing_ratio == 2.0
+
+
+@pytest.mark.parametrize("bad", [
+    dict(time=("not-a-date", "x")),
+    dict(step=(1, "a")),
+    dict(vars=["typo"]),
+])
+def test_bad_request_fails_alone_and_worker_survives(mz, bad):
+    with RequestBatcher(mz, window=0.2, timeout=10) as b:
+        f_bad = b.submit("to_json", **{"vars": ["t"], **bad})
+        f_ok = b.submit("to_json", vars=["t"], lat=(30, 20))
+        with pytest.raises(Exception):
+            f_bad.result(timeout=10)
+        assert f_ok.result(timeout=10) == mz.to_json(vars=["t"], lat=(30, 20))
+        assert b._worker.is_alive()
+        assert b.to_json(vars=["u"], lon=(110, 111)) == mz.to_json(vars=["u"], lon=(110, 111))
+
+
+def test_unbounded_or_oversized_groups_bypass_eager_load(mz):
+    with RequestBatcher(mz, window=0.05, max_bytes=1) as b:
+        out = b.subset(vars=["t"])                    # 无任何范围 → 直接交给 MZDataset，保持惰性
+        assert out["t"].chunks is not None
+        out = b.subset(vars=["t"], lat=(30, 20))      # 包络超过 max_bytes
+        assert out["t"].chunks is not None
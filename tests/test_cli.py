@@ -0,0 +1,35 @@
+import sys
+
+import pytest
+
+import metazarr.cli
+from metazarr import shutdown_executor
+from metazarr.executor import get_executor
+
+
+def _run(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["metazarr", *argv])
+    metazarr.cli.main()
+
+
+def test_workers_alone_configures_threads_backend(workdir, monkeypatch):
+    seen = []
+    monkeypatch.setattr(metazarr.cli, "shutdown_executor", lambda: seen.append(get_executor()))
+    try:
+        _run(monkeypatch, "--workers", "3", "ls")
+    finally:
+        shutdown_executor()
+    backend, = seen
+    assert backend.scheduler.value == "threads"
+    assert backend.limits["ingest"].workers == 3
+
+
+@pytest.mark.parametrize("argv", [
+    ["--memory-limit", "4GB", "ls"],
+    ["--scheduler", "threads", "--memory-limit", "4GB", "ls"],
+])
+def test_memory_limit_without_distributed_is_rejected(workdir, monkeypatch, argv):
+    with pytest.raises(SystemExit) as exc:
+        _run(monkeypatch, *argv)
+    assert exc.value.code == 2
+    assert get_executor() is None
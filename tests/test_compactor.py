@@ -0,0 +1,161 @@
+import shutil
+
+import pytest
+import xarray as xr
+
+import metazarr.compactor
+from metazarr import compact_dataset, create_dataset, open_dataset
+from metazarr.config import DataKind, OrgMode, RawFormat
+from metazarr.exceptions import ValidationError
+from metazarr.utils import load_catalog, read_marker
+
+from conftest import write_cycles
+
+# 2024-07-31 是周三：同一周跨 7 月 / 8 月
+CYCLES = ["2024073100", "2024073112", "2024080100", "2024080112", "2024080200"]
+
+
+@pytest.fixture
+def dataset(workdir):
+    raw = write_cycles(workdir / "raw", CYCLES)
+    create_dataset(
+        data_kind=DataKind.NON_FORECAST, raw_format=RawFormat.NETCDF,
+        description="d", src_paths=[raw], dst_path="out",
+        org_mode=OrgMode.DAILY, name="d", allow_update=True,
+    )
+    return workdir / "out"
+
+
+def _values():
+    return open_dataset("d")._ds["T"].load()
+
+
+def _names(root):
+    return sorted(p.name for p in root.iterdir())
+
+
+def test_compact_keeps_data_and_uses_non_colliding_names(dataset, monkeypatch):
+    before = _values()
+    compact_dataset("d")
+
+    assert _names(dataset) == ["2024073100_day.zarr", "2024080100_day.zarr", "2024080200_day.zarr"]
+    assert read_marker(dataset / "2024073100_day.zarr").get("sources") is None
+    merged = xr.open_zarr(dataset / "2024073100_day.zarr")
+    assert merged["T"].encoding["chunks"][merged["T"].dims.index("valid_time")] == 2   # 整天一个 chunk
+    xr.testing.assert_identical(_values(), before)
+    assert load_catalog()["d"]["org_mode"] == "day"
+
+    compact_dataset("d")                                # 已是目标粒度：不再改动
+    compact_dataset("d", org_mode=OrgMode.WEEKLY)
+    assert _names(dataset) == ["2024072900_week.zarr"]
+    xr.testing.assert_identical(_values(), before)
+
+    monkeypatch.setattr(metazarr.compactor, "_TIME_CHUNK_BYTES", 2 * 3 * 4 * 8)   # 2 个时刻
+    compact_dataset("d", org_mode=OrgMode.ALLIN1)
+    merged = xr.open_zarr(dataset / "2024072900_all.zarr")
+    assert merged["T"].encoding["chunks"][merged["T"].dims.index("valid_time")] == 2
+    xr.testing.assert_identical(_values(), before)
+
+
+def test_eight_digit_cycle_stores_are_compacted(workdir):
+    raw = write_cycles(workdir / "raw", ["20240730", "20240731", "20240801"])
+    create_dataset(
+        data_kind=DataKind.NON_FORECAST, raw_format=RawFormat.NETCDF,
+        description="d", src_paths=[raw], dst_path="out",
+        org_mode=OrgMode.MONTHLY, name="d", allow_update=True,
+    )
+    root = workdir / "out"
+    assert _names(root) == ["20240730.zarr", "20240731.zarr", "20240801.zarr"]
+    before = _values()
+
+    compact_dataset("d")
+    assert _names(root) == ["2024070100_month.zarr", "2024080100_month.zarr"]
+    xr.testing.assert_identical(_values(), before)
+
+
+def test_week_stores_cannot_be_rebucketed_into_months(dataset):
+    compact_dataset("d", org_mode=OrgMode.WEEKLY)
+    for org in (OrgMode.MONTHLY, OrgMode.YEARLY, OrgMode.DAILY):
+        with pytest.raises(ValidationError):
+            compact_dataset("d", org_mode=org)
+    assert _names(dataset) == ["2024072900_week.zarr"]
+
+    compact_dataset("d", org_mode=OrgMode.ALLIN1)
+    assert _names(dataset) == ["2024072900_all.zarr"]
+
+
+def test_crash_after_install_is_readable_and_rerun_finishes(dataset, monkeypatch):
+    before = _values()
+    with monkeypatch.context() as mp, pytest.raises(RuntimeError):
+        mp.setattr(metazarr.compactor, "_finish", lambda store: (_ for _ in ()).throw(RuntimeError("crash")))
+        compact_dataset("d")
+
+    # 新 store 已换入、源 store 尚未删除：读取端按 sources 去重
+    assert "2024073100_day.zarr" in _names(dataset) and "2024073100.zarr" in _names(dataset)
+    xr.testing.assert_identical(_values(), before)
+
+    compact_dataset("d")
+    assert _names(dataset) == ["2024073100_day.zarr", "2024080100_day.zarr", "2024080200_day.zarr"]
+    xr.testing.assert_identical(_values(), before)
+
+
+def test_crash_while_writing_leaves_sources_untouched(dataset, monkeypatch):
+    before = _values()
+    real_write = metazarr.compactor._write_zarr
+
+    def write_then_crash(ds, target, *args, **kwargs):
+        real_write(ds, target, *args, **kwargs)
+        raise RuntimeError("crash")
+
+    with monkeypatch.context() as mp, pytest.raises(RuntimeError):
+        mp.setattr(metazarr.compactor, "_write_zarr", write_then_crash)
+        compact_dataset("d")
+    assert ".2024073100_day.zarr.tmp" in _names(dataset)   # 未提交的半成品
+    xr.testing.assert_identical(_values(), before)
+
+    compact_dataset("d")
+    assert not [n for n in _names(dataset) if n.endswith(".tmp")]
+    xr.testing.assert_identical(_values(), before)
+
+
+def test_recompact_into_same_name_recovers_from_crash_between_renames(dataset, monkeypatch):
+    # 同一天先合并一部分，再追加一个 cycle 后重新合并 → 目标名与源 store 同名
+    shutil.move(str(dataset / "2024080112.zarr"), str(dataset.parent / "late.zarr"))
+    compact_dataset("d")
+    shutil.move(str(dataset.parent / "late.zarr"), str(dataset / "2024080112.zarr"))
+    before = _values()
+
+    real_replace = metazarr.compactor.os.replace
+
+    def crash_after_retire(src, dst):
+        real_replace(src, dst)
+        if str(dst).endswith(".retired.tmp"):
+            raise RuntimeError("crash")
+
+    with monkeypatch.context() as mp, pytest.raises(RuntimeError):
+        mp.setattr(metazarr.compactor.os, "replace", crash_after_retire)
+        compact_dataset("d")
+    assert ".2024080100_day.zarr.retired.tmp" in _names(dataset)
+    assert "2024080100_day.zarr" not in _names(dataset)
+
+    compact_dataset("d")
+    assert _names(dataset) == ["2024073100_day.zarr", "2024080100_day.zarr", "2024080200_day.zarr"]
+    xr.testing.assert_identical(_values(), before)
+
+
+def test_backfilled_cycle_is_merged_in_time_order(dataset):
+    compact_dataset("d")
+    # 合并后再补写一个落在 2024080100_day 中间的 cycle
+    write_cycles(dataset.parent / "late_raw", ["2024080106"])
+    create_dataset(
+        data_kind=DataKind.NON_FORECAST, raw_format=RawFormat.NETCDF,
+        description="e", src_paths=[dataset.parent / "late_raw"], dst_path="late",
+        org_mode=OrgMode.DAILY, name="e", allow_update=True,
+    )
+    shutil.move(str(dataset.parent / "late" / "2024080106.zarr"), str(dataset / "2024080106.zarr"))
+
+    compact_dataset("d")
+    assert _names(dataset) == ["2024073100_day.zarr", "2024080100_day.zarr", "2024080200_day.zarr"]
+    vt = open_dataset("d")._ds.indexes["valid_time"]
+    assert vt.is_monotonic_increasing and len(vt) == len(CYCLES) + 1
+    assert open_dataset("d").subset(time=("2024-08-01T03", "2024-08-01T09")).sizes["valid_time"] == 1
@@ -0,0 +1,19 @@
+import pytest
+
+from metazarr.config import FILENAME_RE
+
+
+@pytest.mark.parametrize("name, var, dt, step", [
+    ("T2025072400.nc",        "T",   "2025072400", None),
+    ("u102025072400.nc",      "u10", "2025072400", None),
+    ("t2m2025072400.012.grb", "t2m", "2025072400", "012"),
+    ("2025072400.nc",         None,  "2025072400", None),
+    ("T20250724.hdf",         "T",   "20250724",   None),
+])
+def test_filename_re(name, var, dt, step):
+    gd = FILENAME_RE.match(name).groupdict()
+    assert (gd["var"], gd["datetime"], gd["step"]) == (var, dt, step)
+
+
+def test_filename_re_rejects():
+    assert FILENAME_RE.match("u10_x.nc") is None
@@ -0,0 +1,95 @@
+import pytest
+import xarray as xr
+
+import metazarr.creator
+import metazarr.index
+from metazarr import create_dataset
+from metazarr.config import DataKind, OrgMode, RawFormat
+from metazarr.exceptions import ConversionError
+from metazarr.utils import is_committed, load_catalog
+
+from conftest import write_cycles
+
+CYCLES = ["2025072400", "2025072406", "2025072412"]
+
+
+def _create(raw):
+    return create_dataset(
+        data_kind=DataKind.NON_FORECAST, raw_format=RawFormat.NETCDF,
+        description="d", src_paths=[raw], dst_path="out",
+        org_mode=OrgMode.DAILY, name="d", allow_update=True,
+    )
+
+
+def test_rerun_after_interrupted_compute_writes_only_missing_cycles(workdir, monkeypatch):
+    raw = write_cycles(workdir / "raw", CYCLES)
+    real_write = metazarr.creator._write_zarr
+
+    def flaky_write(ds, target, *args, **kwargs):
+        if "2025072406" in target.name:
+            raise KeyboardInterrupt("模拟 dask.compute 中途被打断")
+        return real_write(ds, target, *args, **kwargs)
+
+    monkeypatch.setattr(metazarr.creator, "_write_zarr", flaky_write)
+    with pytest.raises(KeyboardInterrupt):
+        _create(raw)
+
+    out = workdir / "out"
+    assert "d" not in load_catalog()
+    # 中断时哪些 cycle 已写完取决于调度顺序；失败的那个一定未提交
+    missing = [c for c in CYCLES if not is_committed(out / f"{c}.zarr")]
+    assert "2025072406" in missing
+    assert not (out / "2025072406.zarr").exists()          # 半成品只留在隐藏的 .tmp 里
+
+    # 重跑：已提交的 cycle 不再读文件头、不再打开，只补写缺失的那个
+    monkeypatch.setattr(metazarr.creator, "_write_zarr", real_write)
+    opened, headers = [], []
+    real_open, real_header = metazarr.creator._open_raw, metazarr.index.read_header
+    monkeypatch.setattr(metazarr.creator, "_open_raw", lambda p, fmt: opened.append(p.name) or real_open(p, fmt))
+    monkeypatch.setattr(metazarr.index, "read_header", lambda p, fmt: headers.append(p.name) or real_header(p, fmt))
+    _create(raw)
+
+    assert sorted(opened) == [f"T{c}.nc" for c in missing]
+    assert headers == []                                   # NetCDF 不走文件头索引，每个文件只打开一次
+    assert all(is_committed(out / f"{c}.zarr") for c in CYCLES)
+    assert not list(out.glob(".*.tmp"))
+    meta = load_catalog()["d"]
+    assert (meta["start_time"], meta["end_time"]) == (CYCLES[0], CYCLES[-1])
+    for c in CYCLES:
+        ds = xr.open_zarr(out / f"{c}.zarr", consolidated=False)
+        assert str(ds.valid_time.values[0])[:13] == f"{c[:4]}-{c[4:6]}-{c[6:8]}T{c[8:]}"
+
+
+def test_header_failure_fails_its_cycle_and_rerun_retries_it(workdir, monkeypatch):
+    raw = write_cycles(workdir / "raw", CYCLES)
+    for f in raw.glob("*.nc"):                             # 以 NetCDF 内容模拟 GRIB 输入
+        f.rename(f.with_suffix(".grb"))
+    real_open = metazarr.creator._open_raw
+    monkeypatch.setattr(metazarr.creator, "_open_raw",
+                        lambda p, fmt: real_open(p, RawFormat.NETCDF))
+    broken = {"T2025072406.grb"}
+
+    def read_header(path, fmt):
+        if path.name in broken:
+            raise OSError("暂时性 IO 错误")
+        return {"variables": ["T"], "levels": [], "valid_times": []}
+
+    monkeypatch.setattr(metazarr.index, "read_header", read_header)
+
+    def create():
+        return create_dataset(
+            data_kind=DataKind.NON_FORECAST, raw_format=RawFormat.GRIB,
+            description="d", src_paths=[raw], dst_path="out",
+            org_mode=OrgMode.DAILY, name="d", allow_update=True,
+        )
+
+    with pytest.raises(ConversionError, match="2025072406"):
+        create()
+    out = workdir / "out"
+    assert [c for c in CYCLES if is_committed(out / f"{c}.zarr")] == ["2025072400", "2025072412"]
+    assert "d" not in load_catalog()
+
+    broken.clear()                                         # IO 恢复后重跑：补写失败的 cycle
+    create()
+    assert all(is_committed(out / f"{c}.zarr") for c in CYCLES)
+    assert load_catalog()["d"]["end_time"] == CYCLES[-1]
@@ -0,0 +1,80 @@
+import threading
+
+import dask
+import dask.array as da
+import pytest
+import xarray as xr
+
+from metazarr import configure_executor, create_dataset, shutdown_executor
+from metazarr.config import DataKind, OrgMode, RawFormat
+from metazarr.executor import compute_kwargs, open_mfdataset
+
+from conftest import write_cycles
+
+
+@pytest.fixture
+def threads2():
+    backend = configure_executor("threads", workers=2)
+    yield backend
+    shutdown_executor()
+
+
+def test_ingest_does_not_deadlock_on_small_pool(workdir, threads2):
+    raw = write_cycles(workdir / "raw", [f"20250724{h:02d}" for h in range(6)])
+    done = []
+    t = threading.Thread(target=lambda: done.append(create_dataset(
+        data_kind=DataKind.NON_FORECAST, raw_format=RawFormat.NETCDF,
+        description="d", src_paths=[raw], dst_path="out",
+        org_mode=OrgMode.DAILY, name="d", allow_update=True,
+    )), daemon=True)
+    t.start()
+    t.join(60)
+    assert done, "create_dataset 在 workers=2 的执行池上卡死"
+    assert len(list((workdir / "out").glob("*.zarr"))) == 6
+
+
+def test_operations_use_their_own_pool_without_touching_global_config(threads2):
+    def worker_name(_):
+        return threading.current_thread().name
+
+    arr = da.ones(4, chunks=1).map_blocks(lambda b: b)
+    for op in ("ingest", "query"):
+        names = dask.compute(
+            [dask.delayed(worker_name)(i) for i in range(4)], **compute_kwargs(op)
+        )[0]
+        assert all(n.startswith(f"metazarr-{op}") for n in names)
+        arr.compute(**compute_kwargs(op))
+
+    assert dask.config.get("pool", None) is None
+    assert dask.config.get("scheduler", None) is None
+
+
+def test_no_backend_means_dask_defaults():
+    shutdown_executor()
+    assert compute_kwargs("ingest") == {}
+
+
+def test_open_mfdataset_keeps_attrs_with_and_without_backend(workdir):
+    raw = write_cycles(workdir / "raw", ["2025072400", "2025072406"])
+    for f in sorted(raw.glob("*.nc")):
+        with xr.open_dataset(f) as ds:
+            ds = ds.load()
+        ds.attrs["title"] = "x"
+        ds["T"].attrs["units"] = "K"
+        ds.to_netcdf(f)
+    paths = [str(f) for f in sorted(raw.glob("*.nc"))]
+
+    def _open():
+        ds = open_mfdataset(paths, operation="query", concat_dim="valid_time")
+        attrs = (ds.attrs, ds["T"].attrs, ds.sizes["valid_time"])
+        ds.close()
+        return attrs
+
+    shutdown_executor()
+    plain = _open()
+    configure_executor("threads", workers=2)
+    try:
+        pooled = _open()
+    finally:
+        shutdown_executor()
+    assert plain == pooled == ({"title": "x"}, {"units": "K"}, 2)
@@ -0,0 +1,33 @@
+import os
+
+import metazarr.index
+from metazarr.config import RawFormat
+from metazarr.index import HeaderIndex
+
+from conftest import write_cycles
+
+
+def test_header_index_reads_each_unchanged_file_once(workdir, monkeypatch):
+    raw = write_cycles(workdir / "raw", ["2025072400", "2025072406"])
+    files = sorted(raw.glob("*.nc"))
+    reads = []
+    real = metazarr.index.read_header
+    monkeypatch.setattr(metazarr.index, "read_header", lambda p, fmt: reads.append(p) or real(p, fmt))
+
+    idx = HeaderIndex()
+    headers = idx.update(files, RawFormat.NETCDF)
+    idx.save()
+    assert len(reads) == 2
+    assert headers[files[0]]["variables"] == ["T"]
+    assert headers[files[0]]["valid_times"] == ["2025-07-24T00:00:00"]
+    assert "messages" not in headers[files[0]]
+
+    # 新实例从磁盘加载：全部命中缓存
+    assert HeaderIndex().update(files, RawFormat.NETCDF) == headers
+    assert len(reads) == 2
+
+    # mtime 变化 ⇒ 只重读这一个文件
+    st = files[1].stat()
+    os.utime(files[1], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    HeaderIndex().update(files, RawFormat.NETCDF)
+    assert len(reads) == 3